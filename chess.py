@@ -7,12 +7,28 @@ Personal Project:
 @author: Beckett Sanderson
 """
 
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
 CHESS = "games.csv"
 
+# columns used for the analysis, the rest of the csv is never loaded
+COLUMNS = ["rated", "turns", "victory_status", "winner", "white_rating", 
+           "black_rating", "opening_eco", "opening_name", "opening_ply"]
+
+# narrow types for the numeric columns to keep the data frame small and 
+# categories for the repeated string columns so they are stored as int codes
+DTYPES = {"rated": "bool", "turns": "int16", "white_rating": "int16", 
+          "black_rating": "int16", "opening_ply": "int8", 
+          "victory_status": "category", "winner": "category", 
+          "opening_eco": "category", "opening_name": "category"}
+
+# rating brackets for beginner, intermediate and advanced games
+RATING_BINS = [0, 1400, 1800, 4000]
+RATING_LABELS = ["beg", "int", "adv"]
+
 def understand(df):
     """
     A function to display info about a df in one line
@@ -33,9 +49,13 @@ def understand(df):
     print(df.shape, "\n")
     
     
-def read_csv(filename, headers = None):
+def read_csv(filename, headers = None, usecols = None, dtype = None, 
+             verbose = False):
     """
-    Reads in a csv with pandas to create a data frame
+    Reads in a csv with pandas to create a data frame. The parsed data is 
+    written to disk as a parquet file next to the csv (e.g. games.parquet) 
+    and reused by later calls with the same columns and types, replacing 
+    the file whenever those arguments change
 
     Parameters
     ----------
@@ -43,6 +63,12 @@ def read_csv(filename, headers = None):
         the location of the file to read in data from.
     headers : list, optional
         the names for the headers of the columns.
+    usecols : list, optional
+        the columns to load, skipping the rest of the csv entirely.
+    dtype : dict, optional
+        the types to use for specific columns.
+    verbose : boolean, optional
+        whether to display info about the data frame. The default is False.
 
     Returns
     -------
@@ -50,110 +76,167 @@ def read_csv(filename, headers = None):
         a data frame containing all the data from the csv.
 
     """
-    df = pd.read_csv(filename)
+    # records the columns and types read so the cache only matches a parse 
+    # of the csv with the same arguments
+    key = repr((sorted(usecols) if usecols != None else None, 
+                sorted((col, str(typ)) for col, typ in dtype.items()) 
+                if dtype != None else None))
+    cache = os.path.splitext(filename)[0] + ".parquet"
+    df = None
+    
+    # loads the cached copy if it is newer than the csv and has the same key
+    if (os.path.exists(cache) and 
+            os.path.getmtime(cache) >= os.path.getmtime(filename)):
+        
+        try:
+            df = pd.read_parquet(cache)
+            
+            if df.attrs.pop("cache_key", None) != key:
+                
+                df = None
+            
+        except (ImportError, ValueError, OSError):
+            df = None
+    
+    # otherwise parses the csv and tries to overwrite the cache for next time
+    if df is None:
+        
+        df = pd.read_csv(filename, usecols = usecols, dtype = dtype)
+        df.attrs["cache_key"] = key
+        
+        try:
+            df.to_parquet(cache)
+            
+        except (ImportError, ValueError, OSError):
+            pass
+        
+        df.attrs.pop("cache_key")
     
     # sets column headers if there are none already
     if headers != None:
         
         df.columns = headers
     
-    #understand(df)
+    # display the df only when debugging
+    if verbose:
+        
+        understand(df)
     
     return df
 
-def get_min(val1, val2):
+def df_cleaning(df, verbose = False):
     """
-    Compare to values and return the smaller value
+    Cleans the data frame for various factors to make analysis easier
 
     Parameters
     ----------
-    val1 : int
-        one number to compare.
-    val2 : int
-        a second number to compare.
+    df : data frame
+        df containing info on chess games.
+    verbose : boolean, optional
+        whether to display info about the data frame. The default is False.
 
     Returns
     -------
-    int
-        the smaller of the two values.
+    df : data frame
+        the same data frame cleaned of specific values.
 
     """
-    if val1 >= val2:
-        return val2
+    # only use rated games for competitiveness factor and opening moves 
+    # has to be >= 2, applied together as one mask
+    mask = df["rated"].to_numpy() & (df["opening_ply"].to_numpy() >= 2)
+    df = df.loc[mask].copy()
+    
+    # create min_rating column
+    df["min_rating"] = np.minimum(df["white_rating"].to_numpy(), 
+                                  df["black_rating"].to_numpy())
     
-    else:
-        return val1
+    # display the df to ensure I've done what I want to
+    if verbose:
+        
+        understand(df)
+    
+    return df
 
 
-def df_cleaning(df):
+def rating_buckets(df):
     """
-    Cleans the data frame for various factors to make analysis easier
+    Labels each game with the rating bracket of its lower rated player and 
+    clears out large rating disrepancies below the advanced bracket
 
     Parameters
     ----------
     df : data frame
-        df containing info on chess games.
+        data frame containing info about chess games.
 
     Returns
     -------
     df : data frame
-        the same data frame cleaned of specific values.
+        a copy of the data frame with a bucket column for the rating bracket.
 
     """
-    # drops columns I'm not using for the analysis
-    df = df.drop(["id", "created_at", "last_move_at", "increment_code", 
-                  "white_id", "black_id", "moves"], axis = 1)
-    
-    # only use rated games for competitiveness factor
-    df = df[df["rated"] == True]
-    
-    # opening moves has to be >= 2
-    df = df[df["opening_ply"] >= 2]
+    # assigns each game to a rating range in one pass
+    bucket = pd.cut(df["min_rating"], RATING_BINS, labels = RATING_LABELS, 
+                    right = True)
     
-    # create min_rating column
-    df["min_rating"] = df.apply(lambda row: get_min(row["white_rating"], 
-                                                    row["black_rating"]), 
-                                axis = 1)
-    
-    # display the df to ensure I've done what I want to
-    understand(df)
+    # remove overly large rating discrepancies outside of advanced games, 
+    # copying out the kept games with their bucket in a single step
+    mask = (bucket != "adv") & (np.abs(df["white_rating"] - 
+                                       df["black_rating"]) > 400)
+    df = df.loc[~mask].assign(bucket = bucket[~mask])
     
     return df
 
 
-def by_rating(df, min_rating, max_rating, clean = False):
+def tally_results(df, keys):
     """
-    Splits a df into a smaller df based around the ratings of the players
+    Counts the white wins, black wins, draws and games for each group of 
+    games in a single groupby
 
     Parameters
     ----------
     df : data frame
-        data frame containing info about chess games.
-    min_rating : int
-        the minimum rating of the range.
-    max_rating : int
-        the maximum rating of the range.
-    clean : boolean
-        whether or not to clear out large disrepancies.
+        data frame containing data related to different chess games.
+    keys : list
+        the columns to group the games by, ending with opening_name.
 
     Returns
     -------
-    new_df : data frame
-        a smaller data frame containing only games with certain ratings.
+    counts : data frame
+        data frame indexed by the keys with a column per winner and games.
 
     """
-    # narrows down the df to only having games within the rating range
-    new_df = df[df["min_rating"] > min_rating]
-    new_df = new_df[new_df["min_rating"] <= max_rating]
+    counts = df.groupby(keys, observed = True)["winner"]
+    counts = counts.value_counts().unstack(fill_value = 0)
+    counts["games"] = counts.sum(axis = 1)
     
-    # checks whether to clear out the large disrepancies
-    if clean:
-        
-        # remove overly large rating discrepancies
-        new_df = new_df[abs(new_df["white_rating"] - 
-                        new_df["black_rating"]) <= 400]
+    return counts
+
+
+def counts_to_dict(counts):
+    """
+    Converts a data frame of results per opening into the opening dictionary
+
+    Parameters
+    ----------
+    counts : data frame
+        data frame indexed by opening with a column per winner and games.
+
+    Returns
+    -------
+    opening_dict : dictionary
+        dictionary containing openings and data related to those openings.
+
+    """
+    # orders the columns so every row is (opening, white, black, draw, games)
+    counts = counts.reindex(columns = ["white", "black", "draw", "games"], 
+                            fill_value = 0)
     
-    return new_df
+    # builds the [white wins, black wins, draws, games] list per opening
+    opening_dict = {name: [white, black, draws, games] 
+                    for name, white, black, draws, games 
+                    in counts.itertuples(name = None)}
+    
+    return opening_dict
 
 
 def split_openings(df):
@@ -172,47 +255,34 @@ def split_openings(df):
         dictionary containing openings and data related to those openings.
 
     """
-    opening_dict = {}
-    
-    # get list of each unique opening
-    opening_names = df["opening_name"].unique()
+    return counts_to_dict(tally_results(df, ["opening_name"]))
+
+
+def split_openings_by_bucket(df):
+    """
+    Splits the data frame into a dictionary of opening dictionaries, one 
+    for each rating bucket
+
+    Parameters
+    ----------
+    df : data frame
+        data frame containing chess games labeled with a rating bucket.
+
+    Returns
+    -------
+    bucket_dict : dictionary
+        dictionary containing an opening dictionary for each bucket.
+
+    """
+    # tallies each result for every bucket and opening in a single groupby
+    counts = tally_results(df, ["bucket", "opening_name"])
     
-    # loops through each unique opening
-    for opening in opening_names:
-        
-        # initializes counter variables for each opening
-        white_wins = 0
-        black_wins = 0
-        draws = 0
-        game_counter = 0
-        
-        # loops through every row in the data frame
-        for idx in df.index:
-            
-            # checks if the opening matches the line of the df
-            if df["opening_name"][idx] == opening:
-                
-                # checks whether the winner was white, black or neither
-                if df["winner"][idx] == "white":
-                    
-                    # adds to counter depending on winner
-                    white_wins += 1
-                    game_counter += 1
-                    
-                elif df["winner"][idx] == "black":
-                    
-                    black_wins += 1
-                    game_counter += 1
-                    
-                else:
-                    
-                    draws += 1
-                    game_counter += 1
-        
-        # adds opening to the dictionary with it's gathered data
-        opening_dict[opening] = [white_wins, black_wins, draws, game_counter]
+    # slices the counts into a separate opening dictionary per bucket
+    bucket_dict = {bucket: counts_to_dict(group.droplevel(0)) 
+                   for bucket, group in counts.groupby(level = 0, 
+                                                       observed = True)}
     
-    return opening_dict
+    return bucket_dict
 
 
 def graph_organization(title, xlabel, ylabel, legend = True):
@@ -236,20 +306,58 @@ def graph_organization(title, xlabel, ylabel, legend = True):
     plt.title(title)
     plt.xlabel(xlabel)
     plt.ylabel(ylabel)
-    plt.legend()
     plt.legend(loc='center left', bbox_to_anchor=(1, 0.5))
     plt.show()
 
 
-def plot_scatter(opening_dict, color = "black", label = None, graph = True):
+def compute_scatter(opening_dict):
     """
-    Plots a scatterplot with a line of best fit for a set of data 
-    found in the dictionary
+    Gets the points and line of best fit for a set of data found in 
+    the dictionary
 
     Parameters
     ----------
     opening_dict : dict
         dictionary containing the openings and corresponding data.
+
+    Returns
+    -------
+    x : numpy array
+        the white wins for every opening.
+    y : numpy array
+        the black wins for every opening.
+    m : float
+        the slope of the line of best fit.
+    b : float
+        the intercept of the line of best fit.
+
+    """
+    # gathers the white and black wins of every opening straight into arrays
+    x = np.fromiter((v[0] for v in opening_dict.values()), 
+                    dtype = float, count = len(opening_dict))
+    y = np.fromiter((v[1] for v in opening_dict.values()), 
+                    dtype = float, count = len(opening_dict))
+    
+    # create data for line of best fit using numpy built in functions
+    m, b = np.polyfit(x, y, 1)
+    
+    return x, y, m, b
+
+
+def render_scatter(x, y, m, b, color = "black", label = None, graph = True):
+    """
+    Plots a scatterplot with a line of best fit from precomputed data
+
+    Parameters
+    ----------
+    x : numpy array
+        the x values of the points.
+    y : numpy array
+        the y values of the points.
+    m : float
+        the slope of the line of best fit.
+    b : float
+        the intercept of the line of best fit.
     color : string, optional
         the color to plot the points and line as. The default is "black".
     label : string, optional
@@ -263,42 +371,8 @@ def plot_scatter(opening_dict, color = "black", label = None, graph = True):
     None.
 
     """
-    legend_count = 0
-    
-    # create initial lists for line of best fit
-    x_vals = []
-    y_vals = []
-    
-    # loops through every opening in the dictionary
-    for opening in opening_dict:
-        
-        # checks if the legend label has been added yet
-        if legend_count == 0:
-            
-            # plots one point with the legend label
-            plt.plot(opening_dict[opening][0], opening_dict[opening][1], 
-                 marker = "o", color = color, label = label, alpha = 0.5)
-            legend_count += 1
-            
-            # appends x and y values for line of best fit 
-            x_vals.append(opening_dict[opening][0])
-            y_vals.append(opening_dict[opening][1])
-            
-        else:
-            
-            # plots the point without the label once label is added
-            plt.plot(opening_dict[opening][0], opening_dict[opening][1], 
-                 marker = "o", color = color, alpha = 0.5)
-            
-            # appends x and y values for line of best fit      
-            x_vals.append(opening_dict[opening][0])
-            y_vals.append(opening_dict[opening][1])
-            
-            
-    # create data for line of best fit using numpy built in functions
-    x = np.array(x_vals)
-    y = np.array(y_vals)
-    m, b = np.polyfit(x, y, 1)
+    # plots all of the openings at once with a single legend label
+    plt.scatter(x, y, color = color, label = label, alpha = 0.5)
     
     # creates line of best fit as a string to allow it to be added to legend
     lobf_as_str = str(round(m, 2)) + " * x + " + str(round(b, 2))
@@ -314,98 +388,93 @@ def plot_scatter(opening_dict, color = "black", label = None, graph = True):
                            "Black Wins with Opening")
 
 
-def get_perc(dic, val_idx, total_val_idx):
+def result_percentages(df):
     """
-    Gets a percentage of two values in a dictionary
+    Gets the percentage of games won by white, won by black and drawn for 
+    each rating bucket
 
     Parameters
     ----------
-    dic : dictionary
-        dictionary containg the data to get a percentage.
-    val_idx : int
-        the index of the value to take as the percent.
-    total_val_idx : int
-        the index of the total games to take the percentage of.
+    df : data frame
+        data frame containing chess games labeled with a rating bucket.
 
     Returns
     -------
-    perc : float
-        the percentage return of the two values.
+    pct : data frame
+        percentages indexed by bucket with a column for each winner.
 
     """
-    val_count = 0
-    total_count = 0
+    # gets every result percentage for every bucket in a single groupby
+    pct = df.groupby("bucket", observed = True)["winner"]
+    pct = pct.value_counts(normalize = True).unstack(fill_value = 0)
+    pct = pct.mul(100).round(2)
     
-    # loops through every index in the dictionary
-    for i in dic:
-        
-        # adds the value count of the index to the total count of the value
-        val_count += dic[i][val_idx]
-        
-        # adds the total count of the index to the total count of the total
-        total_count += dic[i][total_val_idx]
-    
-    # gets the percentage of the value
-    perc = round((val_count / total_count) * 100, 2)
-    
-    return perc
+    return pct
 
 
-def Chess():
+def Chess(verbose = False):
     
     print("Welcome to my chess project!\n")
-    df = read_csv(CHESS)
+    df = read_csv(CHESS, usecols = COLUMNS, dtype = DTYPES, verbose = verbose)
     
     # clean the data to prepare for analyzing
-    df = df_cleaning(df)
+    df = df_cleaning(df, verbose)
     
     # split into 3 groups of rating (> 1400, 1400-1800, < 1800)
-    beginners = by_rating(df, 0, 1400, True)
-    intermediate = by_rating(df, 1400, 1800, True)
-    advanced = by_rating(df, 1800, 4000)
+    df = rating_buckets(df)
     
     # organize by opening {opening: [white wins, black wins, draws, games]}
-    beg_openings = split_openings(beginners)
-    int_openings = split_openings(intermediate)
-    adv_openings = split_openings(advanced)
+    openings = split_openings_by_bucket(df)
+    beg_openings = openings["beg"]
+    int_openings = openings["int"]
+    adv_openings = openings["adv"]
+    
+    # get the points and line of best fit once for each level
+    beg_scatter = compute_scatter(beg_openings)
+    int_scatter = compute_scatter(int_openings)
+    adv_scatter = compute_scatter(adv_openings)
     
     # graph winning percentages by opening for white and black separately
-    plot_scatter(beg_openings, "seagreen", "Beginner (0-1399)")
-    plot_scatter(int_openings, "goldenrod", "Intermediate (1400-1799)")
-    plot_scatter(adv_openings, "lightcoral", "Advanced (1800+)")
+    render_scatter(*beg_scatter, "seagreen", "Beginner (0-1399)")
+    render_scatter(*int_scatter, "goldenrod", "Intermediate (1400-1799)")
+    render_scatter(*adv_scatter, "lightcoral", "Advanced (1800+)")
     
     # graph winning percentages by opening for white and black on same plot
-    plot_scatter(beg_openings, "seagreen", "Beginner (0-1399)", False)
-    plot_scatter(int_openings, "goldenrod", "Intermediate (1400-1799)", False)
-    plot_scatter(adv_openings, "lightcoral", "Advanced (1800+)", False)
+    render_scatter(*beg_scatter, "seagreen", "Beginner (0-1399)", False)
+    render_scatter(*int_scatter, "goldenrod", "Intermediate (1400-1799)", 
+                   False)
+    render_scatter(*adv_scatter, "lightcoral", "Advanced (1800+)", False)
     graph_organization("Chess Openings Success at Varying Levels", 
                        "White Wins with Opening", 
                        "Black Wins with Opening")
     
+    # get win and draw percentages for every level at once
+    pct = result_percentages(df)
+    
     # compare white vs black win percentages at different levels
-    white_beg_perc = get_perc(beg_openings, 0, 3)
-    black_beg_perc = get_perc(beg_openings, 1, 3)
+    white_beg_perc = pct.loc["beg", "white"]
+    black_beg_perc = pct.loc["beg", "black"]
     print("Beginners white win %:", white_beg_perc, "%")
     print("Beginners black win %:", black_beg_perc, "%\n")
     
-    white_int_perc = get_perc(int_openings, 0, 3)
-    black_int_perc = get_perc(int_openings, 1, 3)
+    white_int_perc = pct.loc["int", "white"]
+    black_int_perc = pct.loc["int", "black"]
     print("Intermediate white win %:", white_int_perc, "%")
     print("Intermediate black win %:", black_int_perc, "%\n")
     
-    white_adv_perc = get_perc(adv_openings, 0, 3)
-    black_adv_perc = get_perc(adv_openings, 1, 3)
+    white_adv_perc = pct.loc["adv", "white"]
+    black_adv_perc = pct.loc["adv", "black"]
     print("Advanced white win %:", white_adv_perc, "%")
     print("Advanced black win %:", black_adv_perc, "%\n")
     
     # compare draw percentages at different levels
-    beg_draw_perc = get_perc(beg_openings, 2, 3)
+    beg_draw_perc = pct.loc["beg", "draw"]
     print("Beginners draw %:", beg_draw_perc, "%\n")
     
-    int_draw_perc = get_perc(int_openings, 2, 3)
+    int_draw_perc = pct.loc["int", "draw"]
     print("Intermediate draw %:", int_draw_perc, "%\n")
     
-    adv_draw_perc = get_perc(adv_openings, 2, 3)
+    adv_draw_perc = pct.loc["adv", "draw"]
     print("Advanced draw %:", adv_draw_perc, "%\n")
     
     